@@ -14,25 +14,82 @@ readmeta_print ----> prints a dictionary returned by readmeta()
 segment_map -------> generate a list of all segments in a Jpeg file
 verify_exifheader -> verify the 6-byte Exif header
 verify_jfifheader -> verify the 5-byte Exif header
-verify_marker -----> verify a 2-byte segment marker in the Jpeg file
 verify_tiffheader -> verify the 8-byte TIFF header
 xmpns_tagtype -----> convert an XMP namespace to tagtype identifier
 
 Classes:
 ExifDecoder -------> Decode byte strings from a Jpeg/Exif file
 """
+import os
 import re
 import struct
 import sys
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from xml.etree.ElementTree import fromstring
-from jpegdata import exiftag, seginfo, testimages
+from jpegdata import EXIF_TAGS, exiftag, seginfo, testimages
+
+# translation table for clearing the 8th bit of each byte in ASCII values
+_ASCII7_TABLE = bytes(i & 0x7f for i in range(256))
+
+# precompiled Structs used by ExifDecoder for each byte order: 16-bit value,
+# 32-bit value, and 12-byte IFD entry (tag number, data type, number of
+# values, value/offset)
+_DECODER_STRUCTS = {
+    '<': (struct.Struct('<H'), struct.Struct('<I'), struct.Struct('<HHI4s')),
+    '>': (struct.Struct('>H'), struct.Struct('>I'), struct.Struct('>HHI4s'))}
+
+# metadata dictionary keys ('Exif|tagname') for known Exif tag numbers
+_EXIF_KEYS = {tagno: 'Exif|' + tagname for tagno, tagname in EXIF_TAGS.items()}
+
+# tags whose values are offsets to Exif-specific IFDs (Exif, GPS, and
+# Interoperability), as described in section 4.6.3 of Exif 2.3
+_SUBIFD_TAGS = frozenset({34665, 34853, 40965})
+
+# os.pread() isn't available on Windows
+_HAS_PREAD = hasattr(os, 'pread')
+
+# closing tag of an XMP packet; note that the xpacket end tag can contain
+# either single or double quotes around the end attribute value ('w')
+_XPACKET_END_RE = re.compile(rb'<\?xpacket end=[\'"]w[\'"]\?>', re.I)
+
+# segment markers that have no data size or payload
+_STANDALONE_MARKERS = frozenset({b'\xff\x01', b'\xff\xd0', b'\xff\xd1',
+                                 b'\xff\xd2', b'\xff\xd3', b'\xff\xd4',
+                                 b'\xff\xd5', b'\xff\xd6', b'\xff\xd7',
+                                 b'\xff\xd8', b'\xff\xd9'})
+
+# segment header: 2-byte segment marker followed by big-endian data size
+_SEGMENT_HEADER = struct.Struct('>2sH')
+
+# tagtype identifiers for known XMP namespaces, used by xmpns_tagtype()
+_XMPNS_TAGTYPES = {
+    'http://www.w3.org/1999/02/22-rdf-syntax-ns#': 'XMP-RDF',
+    'http://ns.adobe.com/tiff/1.0/': 'XMP-tiff',
+    'http://ns.adobe.com/xap/1.0/': 'XMP-xap',
+    'http://ns.adobe.com/exif/1.0/': 'XMP-exif',
+    'http://ns.adobe.com/xap/1.0/mm/': 'XMP-xap',
+    'http://purl.org/dc/elements/1.1/': 'XMP-dcore',
+    'http://ns.adobe.com/photoshop/1.0/': 'Photoshop'}
+
+#------------------------------------------------------------------------------
+def _read_at(filehandle, size, offset):
+    """Read bytes from a specified offset in a file.
+
+    Uses os.pread() where available, so that the file position isn't used
+    or changed; otherwise falls back to seek() and read().
+    """
+    if _HAS_PREAD:
+        return os.pread(filehandle.fileno(), size, offset)
+    filehandle.seek(offset, 0)
+    return filehandle.read(size)
 
 #------------------------------------------------------------------------------
 def exifdata_tostring(stored_bytes, datatype, decoder):
     """Convert Exif value to displayable string, based on datatype.
 
-    1st parameter = Exif value as a byte string (as stored in Jpeg file)
+    1st parameter = Exif value as a byte string or memoryview (as stored in
+                    Jpeg file)
     2nd parameter = Exif datatype, as an integer
     3rd parameter = reference to an ExifDecoder object, for decoding
                     byte strings to integer values based on the byte
@@ -44,45 +101,43 @@ def exifdata_tostring(stored_bytes, datatype, decoder):
 
     if datatype == 1:
         # Exif datatype 1 = BYTE (8-bit unsigned integer)
-        displaystring = str(struct.unpack('B', stored_bytes)[0])
+        displaystring = str(stored_bytes[0])
     elif datatype == 2:
         # Exif datatype 2 = ASCII (7-bit values, null-terminated)
-        displaystring = ''
-        mask = 0b01111111
-        for byte in stored_bytes:
-            displaystring += chr(byte & mask) # clear 8th bit
+        displaystring = \
+            stored_bytes.translate(_ASCII7_TABLE).rstrip(b'\x00').decode('ascii')
     elif datatype == 3:
         # Exif datatype 3 = SHORT (16-bit unsigned integer)
-        displaystring = str(decoder.decode_bytes(stored_bytes[0:2]))
+        displaystring = str(decoder.decode_at(stored_bytes, 0, 2))
     elif datatype == 4:
         # Exif datatype 4 = LONG (32-bit unsigned integer)
-        displaystring = str(decoder.decode_bytes(stored_bytes[0:4]))
+        displaystring = str(decoder.decode_at(stored_bytes, 0, 4))
     elif datatype == 5:
         # Exif datatype 5 = RATIONAL (fraction expressed as two LONGs,
         # first is numerator and second is denominator)
-        numerator = decoder.decode_bytes(stored_bytes[0:4])
-        denominator = decoder.decode_bytes(stored_bytes[4:8])
+        numerator = decoder.decode_at(stored_bytes, 0, 4)
+        denominator = decoder.decode_at(stored_bytes, 4, 4)
         displaystring = str(numerator) + '/' + str(denominator)
     elif datatype == 6:
         # Exif datatype 6 = SBYTE (8-bit signed integer, 2s complement)
-        displaystring = struct.unpack_from('b', stored_bytes[0])
+        displaystring = str(int.from_bytes(stored_bytes[0:1], 'big', signed=True))
     elif datatype == 7:
         # Exif datatype 7 = UNDEFINED (one 8-bit byte of any value)
         displaystring = stored_bytes[0]
     elif datatype == 8:
         # Exif datatype 8 = SSHORT (signed SHORT, 16-bit signed
         # integer, 2s complement notation)
-        displaystring = str(decoder.decode_bytes(stored_bytes[0:2]))
+        displaystring = str(decoder.decode_at(stored_bytes, 0, 2))
     elif datatype == 9:
         # Exif datatype 9 = SLONG (signed LONG, 32-bit signed
         # integer, 2s complement notation)
-        displaystring = str(decoder.decode_bytes(stored_bytes[0:4]))
+        displaystring = str(decoder.decode_at(stored_bytes, 0, 4))
     elif datatype == 10:
         # Exif datatype 10 = SRATIONAL (signed rational, a fraction
         # expressed as two SLONGs; first is numerator and second is
         # denominator)
-        numerator = decoder.decode_bytes(stored_bytes[0:4])
-        denominator = decoder.decode_bytes(stored_bytes[4:8])
+        numerator = decoder.decode_at(stored_bytes, 0, 4)
+        denominator = decoder.decode_at(stored_bytes, 4, 4)
         displaystring = str(numerator) + '/' + str(denominator)
     else:
         # unknown data type, so just return the raw data
@@ -91,98 +146,84 @@ def exifdata_tostring(stored_bytes, datatype, decoder):
     return displaystring
 
 #------------------------------------------------------------------------------
-def read_app0_jfif(imagefile, seg_offset, meta_dict):
+def read_app0_jfif(imagefile, payload_offset, payload_size, meta_dict):
     """Read JFIF metadata from an APP0 segment and store in dictionary.
 
-    1st parameter  = file handle for jpeg file, opened as 'rb' read binary
-    2nd parameter = the offset of the APP0 segment to be processed
-    3rd parameter  = dictionary being created by readmeta(); found Exif metadata
-                 will be added to this dictionary
+    1st parameter = file handle for jpeg file, opened as 'rb' read binary
+    2nd parameter = the offset of the APP0 segment's payload
+    3rd parameter = the size of the APP0 segment's payload
+    4th parameter = dictionary being created by readmeta(); found JFIF metadata
+                    will be added to this dictionary
     """
-    imagefile.seek(seg_offset, 0) # go to this APP0 segment
-    verify_marker(imagefile, 'APP0')
-    _ = imagefile.read(2) # skip over the APP0 data size value
+    payload = _read_at(imagefile, payload_size, payload_offset)
 
-    jfifheader = verify_jfifheader(imagefile)
+    jfifheader = verify_jfifheader(payload)
     meta_dict['JFIF|Identifier'] = (jfifheader, '', '', 1)
-    _ = imagefile.read(7) # skip over next 7 bytes
-    xthumb_bytestr = imagefile.read(1)
-    xthumb_int = struct.unpack('B', xthumb_bytestr)[0]
+    # thumbnail sizes follow the 5-byte header and 7 bytes of version,
+    # density units and density values
+    xthumb_int = payload[12]
     meta_dict['JFIF|Xthumbnail'] = (str(xthumb_int), '', '', 1)
-    ythumb_bytestr = imagefile.read(1)
-    ythumb_int = struct.unpack('B', ythumb_bytestr)[0]
+    ythumb_int = payload[13]
     meta_dict['JFIF|Ythumbnail'] = (str(ythumb_int), '', '', 1)
 
 #------------------------------------------------------------------------------
-def read_app1_exif(imagefile, seg_offset, meta_dict):
+def read_app1_exif(imagefile, payload_offset, payload_size, meta_dict):
     """Read Exif metadata from an APP1 segment and store in dictionary.
 
     1st parameter = file handle for jpeg file, opened as 'rb' read binary
-    2nd parameter = the offset of the APP1 segment to be processed
-    3rd parameter = dictionary being created by readmeta(); found Exif metadata
+    2nd parameter = the offset of the APP1 segment's payload
+    3rd parameter = the size of the APP1 segment's payload
+    4th parameter = dictionary being created by readmeta(); found Exif metadata
                     will be added to this dictionary
     """
 
     # See section 4.6.3 of Exif 2.3, "Exif-specific IFDs"
     subifd_queue = deque() # queue of offsets for all exif sub-IFDs found
 
-    imagefile.seek(seg_offset, 0) # go to this APP1 segment
-    verify_marker(imagefile, 'APP1')
-    _ = imagefile.read(2) # skip over the APP1 data size value
-    verify_exifheader(imagefile)
-    tiff_header, byte_order, offset_ifd0 = verify_tiffheader(imagefile)
+    payload = _read_at(imagefile, payload_size, payload_offset)
+    verify_exifheader(payload)
+
+    # The TIFF header follows the 6-byte Exif header. IFD offsets are
+    # relative to the TIFF header, so they can be used directly as offsets
+    # into this (zero-copy) view of the rest of the payload.
+    tiff_data = memoryview(payload)[6:]
+    # the decoder is shared by all IFDs in this segment
+    decoder, offset_ifd0 = verify_tiffheader(tiff_data)
 
     # Iterate through the IFDs in this segment
     offset_ifd = offset_ifd0
     while offset_ifd > 0:
-        imagefile.seek(tiff_header + offset_ifd) # start of IFD
-        offset_ifd = \
-            read_ifd(imagefile, byte_order, meta_dict, subifd_queue)
+        offset_ifd = read_ifd(tiff_data, offset_ifd, decoder, meta_dict,
+                              subifd_queue)
 
     # process subifd_queue (see "4.6.3 Exif-specific IFD" in Exif 2.3)
     while len(subifd_queue) > 0:
         offset_ifd = subifd_queue.popleft()
         while offset_ifd > 0:
-            imagefile.seek(tiff_header + offset_ifd) # start of IFD
-            offset_ifd = \
-                read_ifd(imagefile, byte_order, meta_dict, subifd_queue)
+            offset_ifd = read_ifd(tiff_data, offset_ifd, decoder,
+                                  meta_dict, subifd_queue)
 
 #------------------------------------------------------------------------------
-def read_app1_xmp(imagefile, seg_offset, meta_dict):
+def read_app1_xmp(imagefile, payload_offset, payload_size, meta_dict):
     """Read XMP metadata from an APP1 segment and store in dictionary.
 
     1st parameter = file handle for jpeg file, opened as 'rb' read binary
-    2nd parameter = the offset of the APP1 segment to be processed
-    3rd parameter = dictionary being created by readmeta(); found XMP metadata
+    2nd parameter = the offset of the APP1 segment's payload
+    3rd parameter = the size of the APP1 segment's payload
+    4th parameter = dictionary being created by readmeta(); found XMP metadata
                     will be added to this dictionary
 
     Updates the dictionary with metadata values found in this segment.
     """
-    imagefile.seek(seg_offset, 0) # go to this APP1 segment
-    verify_marker(imagefile, 'APP1')
-
-    # get APP1 data size
-    datasize = struct.unpack('>H', imagefile.read(2))[0]
-
-    # skip over the 29-byte XMP identifier, get to start of the data
-    _ = imagefile.read(29)
+    app1_payload = _read_at(imagefile, payload_size, payload_offset)
 
-    # read the contents of this APP1, and extract the XMP packet
-    payload_size = datasize - 29 - 2
-    app1_payload = imagefile.read(payload_size)
-
-    # Notethat the xpacket end tag can contain either single or double
-    # quotes around the end attribute value ('w'), so we use a regex
-    search_obj = re.search(r'<\?xpacket end=[\'"]w[\'"]\?>',
-                           app1_payload.decode('utf8'), re.I)
+    # search the raw bytes after the 29-byte XMP identifier, so that only
+    # the XMP packet itself is decoded
+    search_obj = _XPACKET_END_RE.search(app1_payload, 29)
     if not search_obj:
         print("ERROR: no closing tag found for XMP packet in APP1 segment!")
         return
-    closing_tag_pos = search_obj.span()[0] + 2
-    if closing_tag_pos == 0:
-        xmp_packet = b''
-    else:
-        xmp_packet = app1_payload[:closing_tag_pos + len('<?xpacket end="w"?>')]
+    xmp_packet = app1_payload[29:search_obj.end()]
 
     for child in fromstring(xmp_packet.decode('utf8')).iter():
         tag_value = child.text
@@ -190,99 +231,110 @@ def read_app1_xmp(imagefile, seg_offset, meta_dict):
             continue # no value to save
 
         # expected syntax: {namespace}tagname
-        match_obj = re.search(r'{(?P<ns>.+)}(?P<tag>.+)', child.tag)
-        if match_obj:
-            xmp_ns = match_obj.group('ns')
-            tagname = match_obj.group('tag')
+        if child.tag.startswith('{'):
+            xmp_ns, _, tagname = child.tag[1:].partition('}')
             meta_dict[xmpns_tagtype(xmp_ns) + '|' + tagname] = (tag_value, '', '', 1)
 
 #------------------------------------------------------------------------------
-def read_app1_xmpext(imagefile, seg_offset, meta_dict):
+def read_app1_xmpext(imagefile, payload_offset, payload_size, meta_dict):
     """Read XMP Extended metadata from an APP1 segment and store in dictionary.
 
     1st parameter = file handle for jpeg file, opened as 'rb' read binary
-    2nd parameter = the offset of the APP1 segment to be processed
-    3rd parameter = dictionary being created by readmeta(); found XMP Extended metadata
+    2nd parameter = the offset of the APP1 segment's payload
+    3rd parameter = the size of the APP1 segment's payload
+    4th parameter = dictionary being created by readmeta(); found XMP Extended metadata
                     will be added to this dictionary
     """
-    imagefile.seek(seg_offset, 0) # go to this APP1 segment
-    verify_marker(imagefile, 'APP1')
-    # skip over the 2-byte APP1 data size value
-    _ = imagefile.read(2)
-    # skip over the 35-byte XMP Extended identifier, get to start of the data
-    _ = imagefile.read(35)
+    del imagefile, payload_size # uniform reader signature; not used yet
+
+    # the payload starts with the 35-byte XMP Extended identifier; the
+    # segment itself starts 4 bytes earlier (segment marker and data size)
     meta_dict['XMP-extended|///ToDo'] = \
-        ('offset = {0}'.format(seg_offset), '', '', 1)
+        ('offset = {0}'.format(payload_offset - 4), '', '', 1)
 
 #------------------------------------------------------------------------------
-def read_app12(imagefile, seg_offset, meta_dict):
+def read_app12(imagefile, payload_offset, payload_size, meta_dict):
     """Read metadata from an APP12 segment and store in dictionary.
 
     1st parameter = file handle for jpeg file, opened as 'rb' read binary
-    2nd parameter = the offset of the APP12 segment to be processed
-    3rd parameter = dictionary being created by readmeta(); found Exif metadata
+    2nd parameter = the offset of the APP12 segment's payload
+    3rd parameter = the size of the APP12 segment's payload
+    4th parameter = dictionary being created by readmeta(); found metadata
                     will be added to this dictionary
     """
-    imagefile.seek(seg_offset, 0) # go to this APP12 segment
-    verify_marker(imagefile, 'APP12')
+    del imagefile, payload_size # uniform reader signature; not used yet
+
+    # the segment starts 4 bytes before the payload
     meta_dict['APP12|///ToDo'] = \
-        ('offset = {0}'.format(seg_offset), '', '', 1)
+        ('offset = {0}'.format(payload_offset - 4), '', '', 1)
 
 #------------------------------------------------------------------------------
-def read_app13(imagefile, seg_offset, meta_dict):
+def read_app13(imagefile, payload_offset, payload_size, meta_dict):
     """Read metadata from an APP13 segment and store in dictionary.
 
     1st parameter = file handle for jpeg file, opened as 'rb' read binary
-    2nd parameter = the offset of the APP13 segment to be processed
-    3rd parameter = dictionary being created by readmeta(); found Exif metadata
+    2nd parameter = the offset of the APP13 segment's payload
+    3rd parameter = the size of the APP13 segment's payload
+    4th parameter = dictionary being created by readmeta(); found metadata
                     will be added to this dictionary
     """
-    imagefile.seek(seg_offset, 0) # go to this APP12 segment
-    verify_marker(imagefile, 'APP13')
+    del imagefile, payload_size # uniform reader signature; not used yet
+
+    # the segment starts 4 bytes before the payload
     meta_dict['APP13|///ToDo'] = \
-        ('offset = {0}'.format(seg_offset), '', '', 1)
+        ('offset = {0}'.format(payload_offset - 4), '', '', 1)
 
 #------------------------------------------------------------------------------
-def read_ifd(filehandle, byte_order, meta_dict, subifd_queue):
+def read_ifd(tiff_data, offset, decoder, meta_dict, subifd_queue):
     """Read an Image File Directory (IFD).
 
-    1st parameter = handle of open jpeg file, positioned to the first
-                    byte of the IFD to be read
-    2nd parameter = the byte alignment setting as stored in the first 2 bytes
-                    of the file's TIFF Header:
-                    b'II' = Intel-style "little endian" encoding is used
-                    b'MM' = Motorola-style "big endian" encoding is used
-    3rd parameter = reference to the dictionary of metadata being created by
+    1st parameter = memoryview containing the TIFF header and the rest of the
+                    APP1 segment's data (values are zero-copy slices of it)
+    2nd parameter = offset of the IFD to be read, relative to the start of
+                    the TIFF header
+    3rd parameter = reference to an ExifDecoder object for the byte alignment
+                    setting stored in the segment's TIFF header
+    4th parameter = reference to the dictionary of metadata being created by
                     readmeta() - found tags/values are added to the dictionary
-    4th parameter = reference to the deque used for storing Exif-specific IFDs
+    5th parameter = reference to the deque used for storing Exif-specific IFDs
                     (aka "sub-IFDs") to be processed
 
     Returns the offset of the next IFD in this segment, or 0 if that was the
     last IFD in the segment.
     """
-    decoder = ExifDecoder(byte_order)
-
-    directory_entries = decoder.decode_bytes(filehandle.read(2))
-    for _ in range(directory_entries):
-
-        exif_tag_no = decoder.decode_bytes(filehandle.read(2))
-        data_type = decoder.decode_bytes(filehandle.read(2))
-        number_of_values = decoder.decode_bytes(filehandle.read(4))
-        tagdata = filehandle.read(4)
-        if exif_tag_no in (34665, 34853, 40965):
+    decode_at = decoder.decode_at # bound once for this IFD
+    directory_entries = decode_at(tiff_data, offset, 2)
+    entries_end = offset + 2 + 12*directory_entries
+    if entries_end > len(tiff_data):
+        # the IFD runs past the end of the segment, so only read the entries
+        # that are present (the next-IFD offset is also missing, so this
+        # ends the chain of IFDs)
+        directory_entries = max(0, (len(tiff_data) - offset - 2) // 12)
+
+    # unpack all of the 12-byte directory entries in a single call
+    for exif_tag_no, data_type, number_of_values, tagdata in \
+            decoder.decode_ifd_entries(tiff_data, offset + 2, directory_entries):
+        if exif_tag_no in _SUBIFD_TAGS:
            # these tags are offsets to Exif-specific IFDs, so add to the
            # sub-IFD queue for processing later
-            subifd_queue.append(decoder.decode_bytes(tagdata))
+            subifd_queue.append(decode_at(tagdata, 0, 4))
 
         else:
             # this is metadata, so add to the metadata dictionary
-            tagname = exiftag(exif_tag_no)
-            dict_key = 'Exif|' + tagname
+            if data_type in (5, 10):
+                # RATIONAL/SRATIONAL values are 8 bytes, so the value
+                # field contains the offset of the value. If the value is
+                # outside the segment, the slice is short and the missing
+                # part is decoded as 0.
+                value_offset = decode_at(tagdata, 0, 4)
+                tagdata = tiff_data[value_offset:value_offset + 8]
+            dict_key = _EXIF_KEYS.get(exif_tag_no) or \
+                'Exif|' + exiftag(exif_tag_no)
             tagvalue = exifdata_tostring(tagdata, data_type, decoder)
-            meta_dict[dict_key] = (tagvalue, str(exif_tag_no), data_type, number_of_values)
+            meta_dict[dict_key] = (tagvalue, exif_tag_no, data_type, number_of_values)
 
     # return the offset to the next IFD
-    return decoder.decode_bytes(filehandle.read(4))
+    return decode_at(tiff_data, entries_end, 4)
 
 #------------------------------------------------------------------------------
 def readmeta(jpg_file):
@@ -296,24 +348,32 @@ def readmeta(jpg_file):
 
     Note that tagno/datatype/numvals are only used with true Exif tags;
     i.e., when tagtype == 'Exif'.
+
+    Raises ValueError if the file's JFIF, Exif or TIFF header is invalid.
     """
     metadata_list = {} # dictionary of metadata found (Exif, XMP, etc)
 
     with open(jpg_file, 'rb') as imagefile:
         segment_list = segment_map(imagefile)
-        for segmark, seg_offset in segment_list:
+        for segmark, _, payload_offset, payload_size in segment_list:
             if segmark == 'APP0':
-                read_app0_jfif(imagefile, seg_offset, metadata_list)
-            if segmark == 'APP1-Exif':
-                read_app1_exif(imagefile, seg_offset, metadata_list)
+                read_app0_jfif(imagefile, payload_offset, payload_size,
+                               metadata_list)
+            elif segmark == 'APP1-Exif':
+                read_app1_exif(imagefile, payload_offset, payload_size,
+                               metadata_list)
             elif segmark == 'APP1-XMP':
-                read_app1_xmp(imagefile, seg_offset, metadata_list)
+                read_app1_xmp(imagefile, payload_offset, payload_size,
+                              metadata_list)
             elif segmark == 'APP1-XMPext':
-                read_app1_xmpext(imagefile, seg_offset, metadata_list)
+                read_app1_xmpext(imagefile, payload_offset, payload_size,
+                                 metadata_list)
             elif segmark == 'APP12':
-                read_app12(imagefile, seg_offset, metadata_list)
+                read_app12(imagefile, payload_offset, payload_size,
+                           metadata_list)
             elif segmark == 'APP13':
-                read_app13(imagefile, seg_offset, metadata_list)
+                read_app13(imagefile, payload_offset, payload_size,
+                           metadata_list)
 
     return metadata_list
 
@@ -332,22 +392,24 @@ def readmeta_print(filename, tag_dict):
     for tagtype_name in sorted(tag_dict):
         tagtype, tagname = tagtype_name.split('|')
         tagdata, tagno, datatype, numvals = tag_dict[tagtype_name]
-        print(tagtype.ljust(12)[:12] + ' ' +
-              tagname.ljust(20)[:20] + ' ' +
-              str(tagdata).ljust(19)[:19] + ' '  +
-              str(tagno).ljust(5)[:5] + ' ' +
-              str(datatype).ljust(2)[:2] + '   ' +
-              str(numvals).ljust(6)[:6])
+        print(f'{tagtype:<12.12} {tagname:<20.20} {str(tagdata):<19.19} '
+              f'{str(tagno):<5.5} {str(datatype):<2.2}   {str(numvals):<6.6}')
 
 #------------------------------------------------------------------------------
 def segment_map(filehandle):
     """Get the map of all segments in a jpeg file.
 
-    1st parameter = file handle of jpeg file, open for binary read
+    1st parameter = file handle of jpeg file, open for binary read; the
+                    file position is not used or changed, except on
+                    platforms without os.pread() (e.g., Windows), where
+                    reads fall back to seek() and read()
 
     Returns a list of tuples corresponding to the segments in the file,
     in the order they occur in the file. Each tuple contains a segment
-    ID and an absolute offset in the file; e.g., ('APP1', 2).
+    ID, the absolute offset of the segment in the file, the absolute
+    offset of the segment's payload (the data after the 2-byte data size),
+    and the size of the payload; e.g., ('APP1-Exif', 2, 6, 8000). Segments
+    that have no payload have a payload size of 0.
 
     Note: we stop at EOI (End Of Image) or SOS (Start Of Scan). This
     means that we ignore any segments that might occur after SOS -- a
@@ -356,151 +418,116 @@ def segment_map(filehandle):
     because we don't have to process any image data.
     """
     segments = [] # initialize the list of segments
-    filehandle.seek(2, 0) # first segment starts right after the SOI
+    cursor = 2 # first segment starts right after the SOI
 
     while True:
-        seg_mark = filehandle.read(2)
-        if len(seg_mark) < 2:
+        # read the segment marker and data size in a single read; for
+        # segments that have no payload, the last 2 bytes are ignored
+        header = _read_at(filehandle, 4, cursor)
+        if len(header) == 4:
+            seg_mark, datasize = _SEGMENT_HEADER.unpack(header)
+        elif len(header) >= 2:
+            # no data size; e.g., EOI at end of file
+            seg_mark, datasize = header[:2], None
+        else:
             break # file parsing error: we've reached EOF unexpectedly
+        payload_offset = cursor + 4
 
-        seg_id = seginfo(seg_mark)['name']
+        seg_id = seginfo(seg_mark).name
 
         if seg_id == 'APP1':
+            if datasize is None:
+                break # file parsing error: we've reached EOF unexpectedly
             # determine whether APP1 format is Exif, XMP, or XMP Extended
-            filepos = filehandle.tell() # note current file position
-            _ = filehandle.read(2) # skip over thec data size value
-            id_str = filehandle.read(35) # APP1 identification string
+            id_str = _read_at(filehandle, 35, payload_offset) # APP1 identifier
             if id_str[:6] == b'Exif\x00\x00':
-                segments.append(('APP1-Exif', filepos-2))
+                seg_id = 'APP1-Exif'
             elif id_str[:29] == b'http://ns.adobe.com/xap/1.0/\x00':
-                segments.append(('APP1-XMP', filepos-2))
+                seg_id = 'APP1-XMP'
             elif id_str[:35] == b'http://ns.adobe.com/xmp/extension/\x00':
-                segments.append(('APP1-XMPext', filepos-2))
+                seg_id = 'APP1-XMPext'
             else:
-                segments.append(('APP1-unknown', filepos-2))
-
-            filehandle.seek(filepos, 0) # return to current file position
-        else:
-            # non-APP1 segment, add it to the list
-            segments.append((seg_id, filehandle.tell()-2))
+                seg_id = 'APP1-unknown'
+            segments.append((seg_id, cursor, payload_offset, datasize-2))
+
+            cursor += 2 + datasize # move to the next segment
+            continue
+
+        if seg_mark in _STANDALONE_MARKERS:
+            # These segment markers have no payload, so the next segment
+            # starts right after the segment marker
+            segments.append((seg_id, cursor, cursor + 2, 0))
+            if seg_id == 'EOI':
+                break # stop processing the image
+            cursor += 2
+            continue
+
+        if datasize is None:
+            break # file parsing error: we've reached EOF unexpectedly
+        segments.append((seg_id, cursor, payload_offset, datasize-2))
 
-        if seg_id == 'EOI' or seg_id == 'SOS':
+        if seg_id == 'SOS':
             break # stop processing the image
 
-        if seg_mark in [b'\xff\x01', b'\xff\xd0', b'\xff\xd1', b'\xff\xd2',
-                        b'\xff\xd3', b'\xff\xd4', b'\xff\xd5', b'\xff\xd6',
-                        b'\xff\xd7', b'\xff\xd8', b'\xff\xd9']:
-            # These segment markers have no payload, so we're already
-            # positioned for the next segment after reading the segment marker
-            datasize = 0
-        else:
-            dsbytes = filehandle.read(2)
-            if len(dsbytes) < 2:
-                break # file parsing error: we've reached EOF unexpectedly
-            datasize = struct.unpack('>H', dsbytes)[0]
-            # skip forward to next segment, ready to repeat the loop
-            filehandle.seek(datasize-2, 1)
+        cursor += 2 + datasize # move to the next segment
 
     return segments
 
 #------------------------------------------------------------------------------
-def verify_exifheader(filehandle=None):
+def verify_exifheader(payload=None):
     """Verify the 6-byte Exif header.
 
-    filehandle = handle of open Jpeg file, positioned to the Exif header
+    payload = byte string that starts with the Exif header (i.e., the
+              payload of an APP1 segment)
 
-    Checks the next 6 bytes and exits program with error message if the
-    expected value is not found.
-
-    Note: file position is advanced 6 bytes by this function.
+    Checks the first 6 bytes and raises ValueError if the expected value is
+    not found.
     """
-    exif_header = filehandle.read(6)
+    exif_header = payload[:6]
     if exif_header != b'Exif\x00\x00':
-        print("INVALID Exif header:", exif_header)
-        sys.exit()
+        raise ValueError('INVALID Exif header: ' + str(exif_header))
 
 #------------------------------------------------------------------------------
-def verify_jfifheader(filehandle=None):
+def verify_jfifheader(payload=None):
     """Verify the 5-byte JFIF header.
 
-    filehandle = handle of open Jpeg file, positioned to the JFIF header
-
-    Checks the next 5 bytes and exits program with error message if an
-    allowed value is not found.
-    Returns the 5 bytes that were read.
+    payload = byte string that starts with the JFIF header (i.e., the
+              payload of an APP0 segment)
 
-    Note: file position is advanced 5 bytes by this function.
+    Checks the first 5 bytes and raises ValueError if an allowed value is
+    not found.
+    Returns the 5 header bytes.
     """
-    jfif_header = filehandle.read(5)
+    jfif_header = payload[:5]
 
     if jfif_header not in [b'JFIF\x00', b'JFXX\x00']:
-        print("INVALID JFIF header:", jfif_header)
-        sys.exit()
+        raise ValueError('INVALID JFIF header: ' + str(jfif_header))
 
     return jfif_header
 
 #------------------------------------------------------------------------------
-def verify_marker(filehandle=None, markertype=None):
-    """Verify a 2-byte segment marker in the Jpeg file.
-
-    filehandle = handle of open Jpeg file, positioned to the marker
-    markertype = expected marker type ('SOI', 'APP1', etc.)
-
-    Checks the marker and exits program with error message if the expected
-    value is not found.
-
-    Note: file position is advanced 2 bytes by this function.
-    """
-    marker = filehandle.read(2)
-
-    if markertype not in ['SOI', 'APP0', 'APP1', 'APP2', 'APP3', 'APP12',
-                          'APP13', 'APP14']:
-        print('Unknown marker type passed to verify_marker(): ' +
-              markertype)
-        sys.exit()
-
-    if markertype == 'SOI' and marker != b'\xff\xd8':
-        print('ERROR: SOI expected but not found.' + str(marker))
-        sys.exit()
-    elif markertype == 'APP0' and marker != b'\xff\xe0':
-        print('ERROR: APP0 expected but not found.' + str(marker))
-    elif markertype == 'APP1' and marker != b'\xff\xe1':
-        print('ERROR: APP1 expected but not found.' + str(marker))
-    elif markertype == 'APP2' and marker != b'\xff\xe2':
-        print('ERROR: APP2 expected but not found.' + str(marker))
-    elif markertype == 'APP3' and marker != b'\xff\xe3':
-        print('ERROR: APP3 expected but not found.' + str(marker))
-    elif markertype == 'APP12' and marker != b'\xff\xec':
-        print('ERROR: APP12 expected but not found.' + str(marker))
-    elif markertype == 'APP13' and marker != b'\xff\xed':
-        print('ERROR: APP13 expected but not found.' + str(marker))
-    elif markertype == 'APP14' and marker != b'\xff\xee':
-        print('ERROR: APP14 expected but not found.' + str(marker))
-
-#------------------------------------------------------------------------------
-def verify_tiffheader(filehandle=None):
+def verify_tiffheader(tiff_data=None):
     """Verify the 8-byte TIFF header.
 
-    filehandle = handle of open Jpeg file, positioned to the marker
+    tiff_data = byte string or memoryview that starts with the TIFF header
 
-    Checks the next 8 bytes and exits program with error message if the
-    expected values are not found.
+    Checks the first 8 bytes and raises ValueError if the expected values
+    are not found.
 
-    Returns a tuple containing the three values read from the TIFF header:
-    (tiff header offset, byte alignment order, offset to IFD0)
+    Returns a tuple containing an ExifDecoder for the byte alignment order
+    read from the TIFF header, and the offset to IFD0 read from the header:
+    (decoder, offset to IFD0)
     """
-    tiff_header = filehandle.tell()
-    byte_alignment = filehandle.read(2)
-    testdecoder = ExifDecoder(byte_alignment)
+    decoder = ExifDecoder(bytes(tiff_data[0:2]))
 
     # verify sample encoding of x2A (42 decimal)
-    sample_encoding = testdecoder.decode_bytes(filehandle.read(2))
+    sample_encoding = decoder.decode_at(tiff_data, 2, 2)
     if sample_encoding != 42:
-        print("Sample encoded value: INCORRECT", sample_encoding)
-        sys.exit()
-    ifd0 = testdecoder.decode_bytes(filehandle.read(4))
+        raise ValueError('Sample encoded value: INCORRECT ' +
+                         str(sample_encoding))
+    ifd0 = decoder.decode_at(tiff_data, 4, 4)
 
-    return (tiff_header, byte_alignment, ifd0)
+    return (decoder, ifd0)
 
 #------------------------------------------------------------------------------
 def xmpns_tagtype(xmp_namespace):
@@ -510,32 +537,20 @@ def xmpns_tagtype(xmp_namespace):
     Returns a tag-type identifier, used to identify the source of
     each metadata value returned in the master dictionary.
     """
-    tagtype = xmp_namespace # default is the full namespace
-    if xmp_namespace == 'http://www.w3.org/1999/02/22-rdf-syntax-ns#':
-        tagtype = 'XMP-RDF'
-    elif xmp_namespace == 'http://ns.adobe.com/tiff/1.0/':
-        tagtype = 'XMP-tiff'
-    elif xmp_namespace == 'http://ns.adobe.com/xap/1.0/':
-        tagtype = 'XMP-xap'
-    elif xmp_namespace == 'http://ns.adobe.com/exif/1.0/':
-        tagtype = 'XMP-exif'
-    elif xmp_namespace == 'http://ns.adobe.com/xap/1.0/mm/':
-        tagtype = 'XMP-xap'
-    elif xmp_namespace == 'http://purl.org/dc/elements/1.1/':
-        tagtype = 'XMP-dcore'
-    elif xmp_namespace == 'http://ns.adobe.com/photoshop/1.0/':
-        tagtype = 'Photoshop'
-    return tagtype
+    # unknown namespaces are returned as-is
+    return _XMPNS_TAGTYPES.get(xmp_namespace, xmp_namespace)
 
 #------------------------------------------------------------------------------
 class ExifDecoder(object):
     """Decode byte strings from a Jpeg/Exif file.
 
-    Afer initializing an ExifDecoder, use the decode_bytes() method to
-    decode values that are read from the file.
+    Afer initializing an ExifDecoder, use the decode_at() method to decode
+    values from a buffer containing the data, or the decode_ifd_entries()
+    method to decode the directory entries of an IFD.
     """
     def __init__(self, endian=None):
         self.byteorder = '<' # default is Intel-style little-endian encoding
+        self._u16, self._u32, self._ifd_entry = _DECODER_STRUCTS['<']
         if endian != None:
             self.set_byteorder(bytealign=endian)
 
@@ -549,7 +564,8 @@ class ExifDecoder(object):
         filename = a JPEG file whose byte alignment setting should be used.
                    If filename is provided, bytealign parameter is ignored.
 
-        Sets self.byteorder to '<' or '>' as appropriate.
+        Sets self.byteorder to '<' or '>' as appropriate, and selects the
+        precompiled Struct objects used by the decoding methods.
         """
         if filename:
             with open(filename, 'rb') as jpeg_source:
@@ -560,24 +576,57 @@ class ExifDecoder(object):
             print('WARNING: invalid endian setting in ExifDecoder - ' +
                   str(bytealign))
         self.byteorder = '<' if bytealign == b'II' else '>'
+        self._u16, self._u32, self._ifd_entry = \
+            _DECODER_STRUCTS[self.byteorder]
 
-    def decode_bytes(self, byte_string):
-        """Decode a byte string, based on current endian setting.
-        """
-        if len(byte_string) == 0:
-            return 0
+    def decode_at(self, buffer, offset, width):
+        """Decode a 2-byte or 4-byte value at an offset in a buffer.
+
+        buffer = byte string (or other object supporting the buffer protocol)
+        offset = offset of the value within the buffer
+        width = size of the value in bytes (2 or 4)
 
-        if len(byte_string) == 2:
-            return struct.unpack(self.byteorder+'H', byte_string)[0]
-        elif len(byte_string) == 4:
-            return struct.unpack(self.byteorder+'I', byte_string)[0]
+        Returns 0 if the value would extend past the end of the buffer.
+        """
+        if offset + width > len(buffer):
+            return 0 # e.g., an offset past the end of the segment
+        if width == 2:
+            return self._u16.unpack_from(buffer, offset)[0]
+        elif width == 4:
+            return self._u32.unpack_from(buffer, offset)[0]
         else:
-            print("Invalid byte string passed to ExifDecoder:", str(byte_string))
+            print("Invalid width passed to ExifDecoder:", str(width))
+
+    def decode_ifd_entries(self, buffer, offset, count):
+        """Decode a series of 12-byte IFD directory entries.
+
+        buffer = byte string containing the IFD
+        offset = offset of the first directory entry within the buffer
+        count = number of directory entries
+
+        Returns an iterator of (tag number, data type, number of values,
+        4-byte value/offset) tuples.
+        """
+        return self._ifd_entry.iter_unpack(buffer[offset:offset + 12*count])
 
 #------------------------------------------------------------------------------
 if __name__ == "__main__":
     TESTFILES = testimages()
-    for fname in TESTFILES:
-        tag_list = readmeta(fname)
-        readmeta_print(fname, tag_list)
-        print('')
+    # read the files on a thread pool so that their I/O overlaps; map()
+    # returns the results in the same order as TESTFILES. Note that warnings
+    # printed while a file is being read (e.g., a missing XMP closing tag)
+    # can appear out of order with the printed tables.
+    with ThreadPoolExecutor() as executor:
+        try:
+            for fname, tag_list in zip(TESTFILES,
+                                       executor.map(readmeta, TESTFILES)):
+                readmeta_print(fname, tag_list)
+                print('')
+        except ValueError as err:
+            # invalid file: report it and stop
+            print(err)
+            sys.exit()
+        finally:
+            # if reading stopped because of an error, don't read any of the
+            # files that haven't been started yet
+            executor.shutdown(cancel_futures=True)
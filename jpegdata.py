@@ -1,34 +1,93 @@
 """Data structures for Jpeg metadata extraction.
 
 exiftag() converts exif tag number (int) to tag description
-seginfo() converts segment marker to dictionary of segment info
+seginfo() converts segment marker to a SegInfo tuple of segment info
 testimages() returns a list of Jpeg images for testing
 """
 import json
 import os
-
-# create Exif tags dictionary from JSON file
-with open('tagnames_exif23.json', 'r') as tagsfile:
-    EXIF_TAGS = json.load(tagsfile)
+from collections import namedtuple
+from functools import lru_cache
+
+# segment info returned by seginfo(); see seginfo() for field descriptions
+SegInfo = namedtuple('SegInfo', 'name has_data has_meta')
+
+# create Exif tags dictionary from JSON file; the JSON object's keys are
+# strings, so they're converted to int tag numbers here. The file is
+# located relative to this module, not the current working directory.
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       'tagnames_exif23.json'), 'r') as tagsfile:
+    EXIF_TAGS = {int(tagno): tagname
+                 for tagno, tagname in json.load(tagsfile).items()}
+
+# segment info for each known segment marker, used by seginfo()
+_SEGDATA = {b'\xff\x01': SegInfo('ff01', False, False),
+            b'\xff\xe0': SegInfo('APP0', True, True),
+            b'\xff\xe1': SegInfo('APP1', True, True),
+            b'\xff\xe2': SegInfo('APP2', True, True),
+            b'\xff\xe3': SegInfo('APP3', True, True),
+            b'\xff\xe4': SegInfo('APP4', True, True),
+            b'\xff\xe5': SegInfo('APP5', True, True),
+            b'\xff\xe6': SegInfo('APP6', True, True),
+            b'\xff\xe7': SegInfo('APP7', True, True),
+            b'\xff\xe8': SegInfo('APP8', True, True),
+            b'\xff\xe9': SegInfo('APP9', True, True),
+            b'\xff\xea': SegInfo('APP10', True, True),
+            b'\xff\xeb': SegInfo('APP11', True, True),
+            b'\xff\xec': SegInfo('APP12', True, True),
+            b'\xff\xed': SegInfo('APP13', True, True),
+            b'\xff\xee': SegInfo('APP14', True, True),
+            b'\xff\xef': SegInfo('APP15', True, True),
+            b'\xff\xfe': SegInfo('COM', True, False),
+            b'\xff\xc4': SegInfo('DHT', True, False),
+            b'\xff\xdb': SegInfo('DQT', True, False),
+            b'\xff\xdd': SegInfo('DRI', True, False),
+            b'\xff\xd9': SegInfo('EOI', False, False),
+            b'\xff\xd0': SegInfo('RST0', False, False),
+            b'\xff\xd1': SegInfo('RST1', False, False),
+            b'\xff\xd2': SegInfo('RST2', False, False),
+            b'\xff\xd3': SegInfo('RST3', False, False),
+            b'\xff\xd4': SegInfo('RST4', False, False),
+            b'\xff\xd5': SegInfo('RST5', False, False),
+            b'\xff\xd6': SegInfo('RST6', False, False),
+            b'\xff\xd7': SegInfo('RST7', False, False),
+            b'\xff\xc0': SegInfo('SOF0', True, False),
+            b'\xff\xc2': SegInfo('SOF2', True, False),
+            b'\xff\xd8': SegInfo('SOI', False, False),
+            b'\xff\xda': SegInfo('SOS', True, False)}
+
+# Segment info for every possible marker, indexed by the marker's second
+# byte (all segment markers start with 0xff). Unknown markers are named
+# with their hex value followed by '?'.
+_SEGTABLE = tuple(_SEGDATA.get(marker, SegInfo(marker.hex() + '?', False, False))
+                  for marker in (bytes((0xff, lowbyte)) for lowbyte in range(256)))
 
 #------------------------------------------------------------------------------
+# EXIF_TAGS is read-only, so results can be cached; the cache is bounded
+# because string arguments are cached separately from tag numbers
+@lru_cache(maxsize=2048)
 def exiftag(tagno):
-    """Convert Exif tag number (string) to description (string)
+    """Convert Exif tag number (int) to description (string)
 
     These tag numbers/names are defined in the Exif 2.3 specification.
+    Tag numbers passed as strings (e.g., '256') are also accepted.
     """
-    tagno_str = str(tagno)
-    if tagno_str in EXIF_TAGS:
-        return EXIF_TAGS[tagno_str]
-    else:
-        return tagno_str + '?'
+    if isinstance(tagno, str):
+        try:
+            tagno = int(tagno)
+        except ValueError:
+            return tagno + '?' # not a tag number
+    tagname = EXIF_TAGS.get(tagno)
+    if tagname is None:
+        tagname = str(tagno) + '?'
+    return tagname
 
 #------------------------------------------------------------------------------
 def seginfo(segment_marker):
-    """Convert segment marker to dictionary of segment info.
+    """Convert segment marker to a SegInfo named tuple of segment info.
 
-    For example, b'\xff\xe1' is converted to a dictionary with these
-    key/value pairs: name: 'APP1', has_data: True, has_meta: True
+    For example, b'\xff\xe1' is converted to a SegInfo with these
+    values: name: 'APP1', has_data: True, has_meta: True
 
     has_data = whether this segment type has a data size in bytes 3-4 and
                a data payload starting at byte 5; if False, then this
@@ -41,47 +100,11 @@ def seginfo(segment_marker):
     additional information on other segment types can be found here:
     http://www.ozhiker.com/electronics/pjmt/jpeg_info/app_segments.html
     """
-    segdata = {b'\xff\x01':{'name':'ff01', 'has_data':False, 'has_meta':False},
-               b'\xff\xe0':{'name':'APP0', 'has_data':True, 'has_meta':True},
-               b'\xff\xe1':{'name':'APP1', 'has_data':True, 'has_meta':True},
-               b'\xff\xe2':{'name':'APP2', 'has_data':True, 'has_meta':True},
-               b'\xff\xe3':{'name':'APP3', 'has_data':True, 'has_meta':True},
-               b'\xff\xe4':{'name':'APP4', 'has_data':True, 'has_meta':True},
-               b'\xff\xe5':{'name':'APP5', 'has_data':True, 'has_meta':True},
-               b'\xff\xe6':{'name':'APP6', 'has_data':True, 'has_meta':True},
-               b'\xff\xe7':{'name':'APP7', 'has_data':True, 'has_meta':True},
-               b'\xff\xe8':{'name':'APP8', 'has_data':True, 'has_meta':True},
-               b'\xff\xe9':{'name':'APP9', 'has_data':True, 'has_meta':True},
-               b'\xff\xea':{'name':'APP10', 'has_data':True, 'has_meta':True},
-               b'\xff\xeb':{'name':'APP11', 'has_data':True, 'has_meta':True},
-               b'\xff\xec':{'name':'APP12', 'has_data':True, 'has_meta':True},
-               b'\xff\xed':{'name':'APP13', 'has_data':True, 'has_meta':True},
-               b'\xff\xee':{'name':'APP14', 'has_data':True, 'has_meta':True},
-               b'\xff\xef':{'name':'APP15', 'has_data':True, 'has_meta':True},
-               b'\xff\xfe':{'name':'COM', 'has_data':True, 'has_meta':False},
-               b'\xff\xc4':{'name':'DHT', 'has_data':True, 'has_meta':False},
-               b'\xff\xdb':{'name':'DQT', 'has_data':True, 'has_meta':False},
-               b'\xff\xdd':{'name':'DRI', 'has_data':True, 'has_meta':False},
-               b'\xff\xd9':{'name':'EOI', 'has_data':False, 'has_meta':False},
-               b'\xff\xd0':{'name':'RST0', 'has_data':False, 'has_meta':False},
-               b'\xff\xd1':{'name':'RST1', 'has_data':False, 'has_meta':False},
-               b'\xff\xd2':{'name':'RST2', 'has_data':False, 'has_meta':False},
-               b'\xff\xd3':{'name':'RST3', 'has_data':False, 'has_meta':False},
-               b'\xff\xd4':{'name':'RST4', 'has_data':False, 'has_meta':False},
-               b'\xff\xd5':{'name':'RST5', 'has_data':False, 'has_meta':False},
-               b'\xff\xd6':{'name':'RST6', 'has_data':False, 'has_meta':False},
-               b'\xff\xd7':{'name':'RST7', 'has_data':False, 'has_meta':False},
-               b'\xff\xc0':{'name':'SOF0', 'has_data':True, 'has_meta':False},
-               b'\xff\xc2':{'name':'SOF2', 'has_data':True, 'has_meta':False},
-               b'\xff\xd8':{'name':'SOI', 'has_data':False, 'has_meta':False},
-               b'\xff\xda':{'name':'SOS', 'has_data':True, 'has_meta':False}}
-
-    if segment_marker in segdata:
-        return segdata[segment_marker]
-    else:
-        # unknown segment marker
-        hexname = ''.join('{:02x}'.format(char) for char in segment_marker)
-        return {'name': hexname + '?', 'has_data': False, 'has_meta': False}
+    if len(segment_marker) == 2 and segment_marker[0] == 0xff:
+        return _SEGTABLE[segment_marker[1]]
+
+    # not a segment marker (e.g., a truncated file)
+    return SegInfo(segment_marker.hex() + '?', False, False)
 
 #------------------------------------------------------------------------------
 def testimages(filtercond=None):
@@ -94,11 +117,16 @@ def testimages(filtercond=None):
     - returned filenames include folder (e.g., 'testimages/whatever.jpg')
     - filtering is case-insensitive
     """
+    if filtercond is not None:
+        filtercond = filtercond.lower()
+
     filenames = []
-    for filename in os.listdir('testimages'):
-        if filename.lower().endswith('.jpg'):
-            if filtercond is None or filtercond.lower() in filename.lower():
-                filenames.append('testimages/' + filename)
+    with os.scandir('testimages') as entries:
+        for entry in entries:
+            filename = entry.name.lower()
+            if entry.is_file() and filename.endswith('.jpg'):
+                if filtercond is None or filtercond in filename:
+                    filenames.append('testimages/' + entry.name)
     return filenames
 
 #------------------------------------------------------------------------------
@@ -117,10 +145,8 @@ if __name__ == '__main__':
     for testseg in TESTSEGS:
         expected = TESTSEGS[testseg]
         testdata = seginfo(testseg)
-        actual = (testdata['name'], testdata['has_data'],
-                  testdata['has_meta'])
-        result = 'PASSED' if expected == actual else 'FAILED'
-        print('|-- ' + result + ': ' + str(testseg) + ' -> ' + testdata['name'])
+        result = 'PASSED' if expected == testdata else 'FAILED'
+        print('|-- ' + result + ': ' + str(testseg) + ' -> ' + testdata.name)
 
     print('-'*42)
     print('exiftag() tests:')
@@ -1,64 +1,121 @@
 """Tools for extracting metadata from Jpeg files.
 
-seg2dict() - convert a Jpeg segment to a dictionary
-segment_list() - create list of segment dictionaries from Jpeg file
+segment_read() - convert a Jpeg segment to a Segment named tuple
+segment_iter() - generate Segment tuples from Jpeg file
+segment_list() - create list of Segment tuples from Jpeg file
 """
+import mmap
 import struct
 import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from jpegdata import seginfo, testimages
 
+# segment info returned by segment_read(); see segment_read() for details
+Segment = namedtuple('Segment', 'offset segmark segtype has_data has_meta '
+                                'payload next_segment')
+
+# segment header: 2-byte segment marker followed by big-endian data size
+_SEGMENT_HEADER = struct.Struct('>2sH')
+
+# segment markers that end the scan for metadata: SOS and EOI
+_TERMINATOR_MARKS = frozenset({b'\xff\xda', b'\xff\xd9'})
+
 #------------------------------------------------------------------------------
-def segment_list(filename=None):
-    """Create list of segment dictionaries from a Jpeg file.
+def segment_iter(filename=None):
+    """Generate Segment tuples from a Jpeg file.
 
     filename = a Jpeg file
-    returns a list of dictionaries, one per segment in the file.
+    yields a Segment named tuple for each segment in the file, as the file
+    is parsed.
 
     Note: since we're only interested in metadata, image data is ignored.
-    """
-    seg_list = []
-
-    with open(filename, 'rb') as jpegfile:
 
+    Note: payloads are memoryviews of the mapped file. The mapping (and
+    the file descriptor it holds) is closed when iteration ends, unless
+    the caller is still holding a payload view at that point; then it
+    stays open until the last such view is released. To avoid keeping
+    files open, use bytes() to copy any payload that's needed after
+    iteration.
+    """
+    # Map the file into memory and parse it in place, rather than issuing
+    # separate read() calls for each field of each segment. Only the pages
+    # that are actually accessed (the metadata before SOS) are read. The
+    # file object is only needed for its file descriptor, so it's opened
+    # unbuffered to avoid allocating a read buffer that would never be used.
+    with open(filename, 'rb', buffering=0) as jpegfile:
+        jpegdata = mmap.mmap(jpegfile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # The mapping holds its own duplicate of the file descriptor, so it
+    # must be closed when iteration ends (or the generator is discarded),
+    # rather than left open for as long as any payload view refers to it.
+    jpegview = memoryview(jpegdata)
+    try:
+        offset = 0
         while True:
-            seg = segment_read(jpegfile)
-            seg_list.append(seg)
-            nextseg = seg['next_segment']
-            if nextseg:
-                jpegfile.seek(nextseg)
-            else:
+            seg = segment_read(jpegview, offset)
+            yield seg
+            offset = seg.next_segment
+            if not offset:
                 break
+    finally:
+        seg = None # drop our own reference to the last payload view
+        jpegview.release()
+        try:
+            jpegdata.close()
+        except BufferError:
+            # the caller is still holding a payload view; the mapping (and
+            # its file descriptor) is released along with the last one
+            pass
+
+#------------------------------------------------------------------------------
+def segment_list(filename=None):
+    """Create list of Segment tuples from a Jpeg file.
 
-    return seg_list
+    filename = a Jpeg file
+    returns a list of Segment named tuples, one per segment in the file.
+    Payloads are copied to bytes, so they remain valid after the file is
+    closed.
+    """
+    segments = []
+    for seg in segment_iter(filename):
+        if seg.payload is not None:
+            seg = seg._replace(payload=bytes(seg.payload))
+        segments.append(seg)
+    return segments
 
 #------------------------------------------------------------------------------
-def segment_read(filehandle=None):
-    """Convert a Jpeg segment to a dictionary.
+def segment_read(data=None, offset=0):
+    """Convert a Jpeg segment to a Segment named tuple.
 
-    filehandle = Jpeg file open for binary read, positioned to first byte
-                 of the segment
+    data = contents of a Jpeg file, as a bytes-like object (bytes,
+           memoryview, etc.)
+    offset = offset of the first byte of the segment within data
 
-    Returns a dictionary with these keys:
+    Returns a Segment with these fields:
         offset = offset of the segment within the Jpeg file
         segmark = the 2-byte segment marker
         segtype = name of this segment type (e.g., 'APP1')
         has_data = whether segment type has a data payload
         has_meta = whether segment type's payload contains metadata
-        payload = segment's data payload
-    """
+        payload = segment's data payload, as a slice of data (if data is
+                  a memoryview, this is a view that doesn't copy the bytes)
+        next_segment = offset of the next segment, or None if this is the
+                       last segment to be processed
 
-    # initialize dictionary object
-    segdict = {}
-    segdict['offset'] = filehandle.tell()
-    segdict['segmark'] = filehandle.read(2)
-    segdict['payload'] = None # default value
-    segdict['next_segment'] = None # default value
+    Use the Segment's _asdict() method if a dictionary is needed.
+    """
+    # Decode the segment marker and the data size (which follows the marker
+    # in segments that have a payload) with a single unpack. The data size
+    # includes the 2-byte size itself but not the 2-byte segment marker.
+    if offset + 4 <= len(data):
+        segmark, datasize = _SEGMENT_HEADER.unpack_from(data, offset)
+    else:
+        # not enough data left for a data size; e.g., EOI at end of file
+        segmark, datasize = bytes(data[offset:offset + 2]), None
 
-    # get info about this segment type and copy to dictionary
-    segtype_info = seginfo(segdict['segmark'])
-    segdict['segtype'] = segtype_info['name']
-    segdict['has_data'] = segtype_info['has_data']
-    segdict['has_meta'] = segtype_info['has_meta']
+    # get info about this segment type
+    segtype, has_data, has_meta = seginfo(segmark)
 
     # Stop processing the file when SOS or EOI segment reached. We do this
     # because we're only interested in reading metadata, and want to maximize
@@ -76,29 +133,37 @@ def segment_read(filehandle=None):
     # in an actual Jpeg, but it's theoretically possible and by checking for
     # both SOS and EOI here we will gracefully handle any such file.
 
-    if segdict['segtype'] in ['SOS', 'EOI']:
-        return segdict
+    # Also stop if the end of the data has been reached unexpectedly.
+    if segmark in _TERMINATOR_MARKS or len(segmark) < 2:
+        return Segment(offset, segmark, segtype, has_data, has_meta,
+                       None, None)
 
     # if this segment type has no data payload, then the next segment
     # starts right after the 2-byte segment marker
-    if not segdict['has_data']:
-        segdict['next_segment'] = segdict['offset'] + 2
-        return segdict
-
-    # read data size; note that this size includes the 2-byte size
-    # itself but doesn't include the 2-byte segment marker
-    datasize_bytes = filehandle.read(2)
-    datasize = struct.unpack('>H', datasize_bytes)[0]
-
-    # if segment contains metadata, save a copy in the segment's dictionary
-    if segdict['has_meta']:
-        segdict['payload'] = filehandle.read(datasize - 2)
-    else:
-        # no metadata to save, so just skip past the data
-        filehandle.seek(datasize-2, 1)
-    segdict['next_segment'] = filehandle.tell()
+    if not has_data:
+        return Segment(offset, segmark, segtype, has_data, has_meta,
+                       None, offset + 2)
+
+    # stop if the data ends before the data size
+    if datasize is None:
+        return Segment(offset, segmark, segtype, has_data, has_meta,
+                       None, None)
+
+    # if segment contains metadata, save it in the Segment
+    next_segment = offset + 2 + datasize
+    if has_meta:
+        return Segment(offset, segmark, segtype, has_data, has_meta,
+                       data[offset + 4:next_segment], next_segment)
+    return Segment(offset, segmark, segtype, has_data, has_meta,
+                   None, next_segment)
 
-    return segdict
+#------------------------------------------------------------------------------
+def _segment_rows(filename):
+    """Get the (segtype, has_data, has_meta) values of each segment in a
+    Jpeg file, for printing by the test code below.
+    """
+    return [(seg.segtype, seg.has_data, seg.has_meta)
+            for seg in segment_iter(filename)]
 
 #------------------------------------------------------------------------------
 if __name__ == '__main__':
@@ -110,15 +175,23 @@ if __name__ == '__main__':
         # use test files from testimages subfolder
         TESTFILES = testimages()
 
-    for fname in TESTFILES:
-        print('-'*32, fname, '-'*32, sep='\n')
-        segments = segment_list(fname)
-        for segment in segments:
-            print('|-- ' + segment['segtype'].ljust(5) + ' - ', end='')
-            if segment['has_meta']:
-                print('METADATA')
-            else:
-                if segment['has_data']:
-                    print('image data')
+    # parse the files in a pool of processes, since parsing is pure Python
+    # and would otherwise be serialized by the GIL; map() returns the
+    # results in the same order as TESTFILES. Each worker returns only the
+    # (segtype, has_data, has_meta) rows that are printed, which can be
+    # pickled and don't retain any payloads or mapped files. Files are sent
+    # to the workers in chunks, to keep the IPC overhead per file low.
+    with ProcessPoolExecutor() as executor:
+        for fname, rows in zip(TESTFILES,
+                               executor.map(_segment_rows, TESTFILES,
+                                            chunksize=16)):
+            print('-'*32, fname, '-'*32, sep='\n')
+            for row_type, row_has_data, row_has_meta in rows:
+                print('|-- ' + row_type.ljust(5) + ' - ', end='')
+                if row_has_meta:
+                    print('METADATA')
                 else:
-                    print('segment marker only')
+                    if row_has_data:
+                        print('image data')
+                    else:
+                        print('segment marker only')